@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import copy
+import datetime
+import fnmatch
 import os
 import socket
 import sys
@@ -10,11 +13,18 @@ import traceback
 import github
 
 from __init__ import __version__
+import impl.backfill
+import impl.digest
 import impl.encoding
 import impl.mail
 import impl.output
 import impl.persistence
+import impl.replay
+import impl.service
+import impl.timestamp
+import impl.watchlist
 from impl.timestamp import Timestamp
+from impl.watchlist import Watchlist
 
 def _since_command(command_argname):
     """Decorator for Cli commands that require a 'since' argument.
@@ -55,7 +65,16 @@ class Cli:
         """
         self.errorto = None
         self.__argv = argv
+        self.__watchlist_ttl = 0
+        self.__window = None
+        self.__max_commits = None
+        self.__summary_messages = None
+        self.__commit_filters = {}
+        self.__included_repos = None
+        self.__excluded_repos = None
+        self.__persist = False
         self.__github = None
+        self.__requester = None
         self.__mail_sender = mail_sender
         self._output = output
         self._memory = impl.persistence.Memory()
@@ -86,6 +105,47 @@ class Cli:
                     help="gicowa will keep track of the last commands run in %s" %
                             (self._memory.filename))
 
+        parser.add_argument("--watchlist-ttl", type=int, default=0, metavar="SECONDS",
+                    help="with %s, reuse a watchlist fetched less than SECONDS ago instead of "
+                            % (self._persist_option) + "checking it for changes (default: 0)")
+
+        parser.add_argument("--window", type=_positive_int, metavar="DAYS",
+                            help="list commits DAYS days at a time, newest first; with %s, "
+                            % (self._persist_option)
+                            + "an interrupted listing resumes where it stopped")
+        parser.add_argument("--max-commits", type=_positive_int, metavar="N",
+                            help="list at most N commits per repo")
+
+        parser.add_argument("--summary", action="store_true",
+                            help="summarize commits per repo instead of listing them")
+        parser.add_argument("--summary-messages", type=_positive_int, default=5, metavar="N",
+                            help="with --summary, show the N newest commit messages and the N "
+                            + "most active authors per repo (default: 5)")
+
+        parser.add_argument("--author", metavar="LOGIN",
+                            help="list only commits authored by LOGIN or e-mail address")
+        parser.add_argument("--path", help="list only commits touching PATH")
+        parser.add_argument("--branch",
+                            help="list commits on BRANCH instead of the default branch")
+        parser.add_argument("--include", action="append", metavar="GLOB",
+                            help="consider only watched repos matching GLOB "
+                            + "(e.g. 'AurelienLourot/*'), can be repeated")
+        parser.add_argument("--exclude", action="append", metavar="GLOB",
+                            help="ignore watched repos matching GLOB, can be repeated")
+
+        traffic = parser.add_mutually_exclusive_group()
+        traffic.add_argument("--record", metavar="DIR",
+                             help="save all GitHub API requests and responses to DIR, "
+                             + "credentials excluded, as well as %s as it was before"
+                             % (self._memory.filename))
+        traffic.add_argument("--replay", metavar="DIR",
+                             help="answer GitHub API requests from DIR, filled by --record, "
+                             + "instead of the network, starting from the %s saved there and "
+                             % (self._memory.filename) + "never saving it")
+        parser.add_argument("--replay-latency", choices=("original", "zero"), default="original",
+                            help="with --replay, delay responses as originally or not at all "
+                            + "(default: original)")
+
         subparsers = parser.add_subparsers(help="available commands")
 
         descr = "list repos watched by a user"
@@ -109,6 +169,21 @@ class Cli:
         self._add_argument_watcher_name(parser_lastwatchedcommits)
         self._add_arguments_since_committer_timestamp(parser_lastwatchedcommits)
 
+        descr = "list last commits on repos of an organization"
+        parser_lastorgcommits = subparsers.add_parser("lastorgcommits", description=descr,
+                                                      help=descr)
+        parser_lastorgcommits.set_defaults(command="lastorgcommits", impl=self.__lastorgcommits)
+        parser_lastorgcommits.add_argument("org", help="organization's name (e.g. 'ghuser-io')")
+        self._add_arguments_since_committer_timestamp(parser_lastorgcommits)
+
+        descr = "watch repos on behalf of watchers registered through a local HTTP API"
+        parser_serve = subparsers.add_parser("serve", description=descr, help=descr)
+        parser_serve.set_defaults(command="serve", impl=self.__serve)
+        parser_serve.add_argument("--port", type=int, default=8080,
+                                  help="port of the HTTP API on localhost (default: 8080)")
+        parser_serve.add_argument("--interval", type=int, default=3600, metavar="SECONDS",
+                                  help="time between two polls of a repo (default: 3600)")
+
         args = parser.parse_args(self.__argv)
 
         if args.mailfrom is not None:
@@ -124,30 +199,61 @@ class Cli:
         if args.mailto is not None:
             self.__mail_sender.dest.add(args.mailto)
         self.errorto = args.errorto
+        self.__watchlist_ttl = args.watchlist_ttl
+        self.__window = args.window
+        self.__max_commits = args.max_commits
+        self.__summary_messages = args.summary_messages if args.summary else None
+        # Passed to get_commits() so that GitHub filters commits itself:
+        self.__commit_filters = dict((name, value) for name, value in (("author", args.author),
+                                                                       ("path", args.path),
+                                                                       ("sha", args.branch))
+                                     if value is not None)
+        self.__included_repos = args.include
+        self.__excluded_repos = args.exclude
+        self.__persist = args.persist
 
         self._output.colored = not args.no_color
 
-        if args.credentials is not None:
-            credentials = args.credentials.split(":", 1)
-            try:
-                self.__github = github.Github(credentials[0], credentials[1])
-            except IndexError as e:
-                e.args += ("Bad credentials' syntax.",)
-                raise
-        else:
-            self.__github = github.Github()
+        traffic = None
+        if args.record is not None:
+            traffic = impl.replay.Recorder(args.record)
+            memory_filename = impl.replay.memory_filename(args.record)
+            if not os.path.exists(memory_filename): # else recording several runs in a row
+                self._memory.save(memory_filename)
+        elif args.replay is not None:
+            traffic = impl.replay.Player(args.replay, args.replay_latency == "original")
+            # What the run requests depends on the memory, and the real one must stay untouched:
+            self._memory = impl.persistence.Memory(impl.replay.memory_filename(args.replay))
+            self.__persist = False
+        if traffic is not None:
+            traffic.install()
 
         try:
-            args.impl(args)
-        except github.GithubException as e:
-            if e.status == 401 and args.credentials is not None:
-                e.args += ("Bad credentials?",)
-            if e.status == 403 and args.credentials is None:
-                e.args += ("API rate limit exceeded? Use the %s option." % (credentials_option),)
-            raise
-        except socket.gaierror as e:
-            e.args += ("No internet connection?",)
-            raise
+            if args.credentials is not None:
+                credentials = args.credentials.split(":", 1)
+                try:
+                    self.__github = github.Github(credentials[0], credentials[1])
+                except IndexError as e:
+                    e.args += ("Bad credentials' syntax.",)
+                    raise
+            else:
+                self.__github = github.Github()
+
+            try:
+                args.impl(args)
+            except github.GithubException as e:
+                if e.status == 401 and args.credentials is not None:
+                    e.args += ("Bad credentials?",)
+                if e.status == 403 and args.credentials is None:
+                    e.args += ("API rate limit exceeded? Use the %s option."
+                               % (credentials_option),)
+                raise
+            except socket.gaierror as e:
+                e.args += ("No internet connection?",)
+                raise
+        finally:
+            if traffic is not None:
+                traffic.uninstall()
 
         if len(self.__mail_sender.dest):
             email_sent = _send_output_by_mail_if_necessary(self.__mail_sender, args.command + ".",
@@ -155,7 +261,7 @@ class Cli:
             if not email_sent:
                 self._output.echo("No e-mail sent.")
 
-        if args.persist:
+        if self.__persist:
             self._memory.save()
 
     @staticmethod
@@ -203,10 +309,13 @@ class Cli:
         @param args: from argparse.
         @param since: from decoration.
         """
-        pushed = self.__has_been_pushed(args.repo, since.to_datetime())
+        since = since.to_datetime()
+        repo = self.__get_repo(args.repo)
+        pushed = self.__has_been_pushed(repo, since)
         if pushed is not None:
             self._output.echo(pushed)
-        for commit in self.__get_last_commits(args.repo, since.to_datetime()):
+        backfills = self._memory.backfills.setdefault(args.command + " " + args.repo, {})
+        for commit in self.__get_last_commits(repo, since, backfills):
             self._output.echo(commit)
 
     @_since_command("username")
@@ -218,51 +327,274 @@ class Cli:
         @param args: from argparse.
         @param since: from decoration.
         """
-        for repo in self.__get_watchlist(args.username):
-            pushed = self.__has_been_pushed(repo, since.to_datetime())
-            if pushed is not None:
-                self._output.echo("%s - %s" % (self._output.red(repo), pushed))
-            for commit in self.__get_last_commits(repo, since.to_datetime()):
-                self._output.echo("%s - %s" % (self._output.red(repo), commit))
+        since = since.to_datetime()
+        repos = self.__get_watchlist(args.username)
+        backfills = self._memory.backfills.setdefault(args.command + " " + args.username, {})
+        now = impl.timestamp.to_epoch(datetime.datetime.utcnow())
+        skipped_repos = []
+        for repo_full_name in repos:
+            self.__echo_repo_commits_or_skip(repo_full_name, since, backfills, now, skipped_repos)
+        self.__echo_skipped_repos(skipped_repos)
+
+    @_since_command("org")
+    def __lastorgcommits(self, args, since):
+        """Implements 'lastorgcommits' command.
+        Prints all commits on repos of organization 'args.org' with committer timestamp bigger than
+        'args.YYYY,MM,DD,hh,mm,ss'.
+        Repos are listed most recently pushed first and the listing stops at the first one which
+        hasn't been pushed since then, so that a quiet organization costs one single request.
+
+        @param args: from argparse.
+        @param since: from decoration.
+        """
+        since = since.to_datetime()
+        backfills = self._memory.backfills.setdefault(args.command + " " + args.org, {})
+        now = impl.timestamp.to_epoch(datetime.datetime.utcnow())
+        skipped_repos = []
+        for repo in self.__get_org_repos(args.org):
+            if repo.pushed_at is None or repo.pushed_at < since:
+                break
+            if self.__select_repos((repo.full_name,)):
+                self.__echo_repo_commits_or_skip(repo, since, backfills, now, skipped_repos)
+        self.__echo_skipped_repos(skipped_repos)
+
+    def __serve(self, args):
+        """Implements 'serve' command.
+        Runs an impl.service.Service sharing self._memory's repo states among all watchers, until
+        interrupted.
+
+        @param args: from argparse.
+        """
+        if not self.__watchlist_ttl:
+            self.__watchlist_ttl = args.interval
+        service = impl.service.Service(self._memory.watchers, self._memory.repos, self.__poll,
+                                       self.__get_watchlist,
+                                       self.__notify, _print, args.interval)
+        server = service.make_server("localhost", args.port)
+        self._output.echo("Serving on http://localhost:%s/watchers" % (server.server_port))
+        service.serve_forever(server, self._memory.save if self.__persist else lambda: None)
+
+    def __poll(self, repo_full_name, since):
+        """Returns lines describing what got pushed on 'repo_full_name' since 'since', in UTC epoch
+        seconds, as printed by lastwatchedcommits.
+        """
+        since = datetime.datetime.utcfromtimestamp(since)
+        repo = self.__get_repo(repo_full_name)
+        pushed = self.__has_been_pushed(repo, since)
+        if pushed is None:
+            return [] # no commit can be newer than the last push
+        return ["%s - %s" % (self._output.red(repo.full_name), line)
+                for line in [pushed] + list(self.__get_last_commits(repo, since, {}))]
+
+    def __notify(self, watcher, lines):
+        """Sends 'lines' by e-mail to 'watcher', see impl.service.Service.
+        """
+        output = impl.output.Output(lambda text: None)
+        output.echo("Pushed on repos watched by %s"
+                    % (watcher.get("username") or ", ".join(watcher["repos"])))
+        for line in lines:
+            output.echo(line)
+        mail_sender = copy.copy(self.__mail_sender)
+        mail_sender.dest = set((watcher["mailto"],))
+        _send_output_by_mail_if_necessary(mail_sender, "serve.", output)
+
+    def __echo_repo_commits(self, repo, since, backfills):
+        """Prints last push timestamp of 'repo' and its commits as listed by __get_last_commits(),
+        each line prefixed with the repo's name.
+        """
+        pushed = self.__has_been_pushed(repo, since)
+        if pushed is not None:
+            self._output.echo("%s - %s" % (self._output.red(repo.full_name), pushed))
+        for commit in self.__get_last_commits(repo, since, backfills):
+            self._output.echo("%s - %s" % (self._output.red(repo.full_name), commit))
+
+    def __echo_repo_commits_or_skip(self, repo, since, backfills, now, skipped_repos):
+        """Calls __echo_repo_commits() unless 'repo' is unavailable, in which case it gets appended
+        to 'skipped_repos' and isn't attempted again before the end of its backoff, see
+        self._memory.repos.fail().
+
+        @param repo: github.Repository.Repository or full name.
+        @param now: UTC epoch seconds.
+        """
+        repo_full_name = repo if isinstance(repo, basestring) else repo.full_name
+        if self._memory.repos.is_failing(repo_full_name, now):
+            skipped_repos.append(repo_full_name)
+            return
+        try:
+            if isinstance(repo, basestring):
+                repo = self.__get_repo(repo)
+            self.__echo_repo_commits(repo, self.__get_repo_since(repo.full_name, since), backfills)
+        except github.GithubException as e:
+            if not _is_repo_unavailable(e):
+                raise
+            self._memory.repos.fail(repo_full_name, e.status, now)
+            skipped_repos.append(repo_full_name)
+            return
+        self._memory.repos.recover(repo.full_name)
+
+    def __get_repo_since(self, repo_full_name, since):
+        """Returns 'since', or the time 'repo_full_name' was last listed if earlier and it has been
+        skipped since then, see self._memory.repos.fail(), so that what got pushed meanwhile
+        gets listed once it's available again.
+        """
+        if repo_full_name not in self._memory.repos:
+            return since
+        state = self._memory.repos.get(repo_full_name)
+        if not state.failures or not state.cursor:
+            return since
+        return min(since, datetime.datetime.utcfromtimestamp(state.cursor))
+
+    def __echo_skipped_repos(self, skipped_repos):
+        """Prints repos skipped because they were unavailable, see self._memory.repos.fail().
+        """
+        if not len(skipped_repos):
+            return
+        self._output.echo("Skipped unavailable repos:")
+        for repo_full_name in skipped_repos:
+            state = self._memory.repos.get(repo_full_name)
+            self._output.echo("%s - HTTP %s, %s failure(s), next attempt on %s"
+                              % (self._output.red(repo_full_name), state.status, state.failures,
+                                 self._output.green(datetime.datetime.utcfromtimestamp(
+                                     state.next_poll))))
+
+    def __get_org_repos(self, org):
+        """Yields all repos of organization 'org', most recently pushed first, fetching them page
+        by page as needed.
+        """
+        requester = self.__get_requester()
+        page = 1
+        while True:
+            try:
+                headers, data = requester.requestJsonAndCheck(
+                    "GET", "/orgs/%s/repos" % (org), {"sort": "pushed", "direction": "desc",
+                                                     "per_page": impl.watchlist.per_page,
+                                                     "page": page})
+            except github.GithubException as e:
+                if e.status == 404:
+                    e.args += ("%s organization doesn't exist?" % (org),)
+                raise
+            for attributes in data:
+                yield github.Repository.Repository(requester, headers, attributes, completed=False)
+            if len(data) < impl.watchlist.per_page:
+                return
+            page += 1
 
     def __get_watchlist(self, username):
         """Returns list of all watched repos of 'username'.
+        The list is cached in self._memory.watchlists for self.__watchlist_ttl seconds.
         """
+        watchlist = self._memory.watchlists.setdefault(username, Watchlist())
+        if not watchlist.is_outdated(self.__watchlist_ttl):
+            return self.__select_repos(watchlist.repos)
+
         try:
-            user = self.__github.get_user(username)
+            watchlist.refresh(self.__get_requester(), "/users/%s/subscriptions" % (username))
         except github.GithubException as e:
             if e.status == 404:
                 e.args += ("%s user doesn't exist?" % (username),)
             raise
+        return self.__select_repos(watchlist.repos)
 
-        return [repo.full_name for repo in user.get_subscriptions()]
+    def __get_requester(self):
+        """Returns the github.Requester.Requester of self.__github, for the requests PyGithub
+        doesn't offer, e.g. conditional or paginated on demand.
+        PyGithub doesn't expose it but through the objects it creates. The authenticated user is
+        one of them and get_user() creates it without sending any request.
+        """
+        if self.__requester is None:
+            self.__requester = self.__github.get_user()._requester
+        return self.__requester
 
-    def __get_last_commits(self, repo_full_name, since):
-        """Returns list of all commits on 'repo_full_name' with committer timestamp bigger than
-        'since'.
+    def __select_repos(self, full_names):
+        """Returns the repos among 'full_names' matching self.__included_repos if any, and none of
+        self.__excluded_repos.
         """
-        repo = self.__get_repo(repo_full_name)
-        result = []
-        for i in repo.get_commits(since=since):
-            commit = repo.get_git_commit(i.sha)
-            result.append("Committed on %s - %s - %s"
-                          % (self._output.green(commit.committer.date),
-                             self._output.blue(commit.committer.name), commit.message))
-        return result
-
-    def __has_been_pushed(self, repo_full_name, since):
-        """Returns string describing last push timestamp of 'repo_full_name''s last commit if after
-        'since'. Returns None otherwise.
+        return [full_name for full_name in full_names
+                if (self.__included_repos is None
+                    or _matches_any(full_name, self.__included_repos))
+                and not _matches_any(full_name, self.__excluded_repos or ())]
+
+    def __get_last_commits(self, repo, since, backfills):
+        """Yields all commits on 'repo' with committer timestamp bigger than 'since' and matching
+        self.__commit_filters, newest first, at most self.__max_commits of them.
+        With self.__summary_messages, yields a summary of them instead, see impl.digest.
+        With self.__window, lists them window by window and checkpoints each window in 'backfills'
+        once listed, so that an interrupted listing gets resumed by the next call.
+        Remembers the most recent one as the repo's head in self._memory.repos.
         """
-        repo = self.__get_repo(repo_full_name)
+        now = impl.timestamp.to_epoch(datetime.datetime.utcnow())
+        window = None if self.__window is None else self.__window * 24 * 3600
+        backfill = impl.backfill.Backfill(impl.timestamp.to_epoch(since), now, window,
+                                          backfills.get(repo.full_name))
+        head_sha = None
+        capped = False
+        digest = None
+        if self.__summary_messages is not None:
+            digest = impl.digest.Digest(repo.full_name,
+                                        self.__commit_filters.get("sha", repo.default_branch),
+                                        self.__summary_messages)
+        for start, end in backfill.windows():
+            if window is None:
+                commits = repo.get_commits(since=since, **self.__commit_filters)
+            else:
+                commits = repo.get_commits(since=datetime.datetime.utcfromtimestamp(start),
+                                           until=datetime.datetime.utcfromtimestamp(end),
+                                           **self.__commit_filters)
+            for i in _unless_empty(commits):
+                if self.__max_commits is not None and backfill.count >= self.__max_commits:
+                    capped = True
+                    break
+                commit = repo.get_git_commit(i.sha)
+                if head_sha is None and end == now and not self.__commit_filters: # newest commit
+                    head_sha = i.sha
+                backfill.count += 1
+                if digest is not None:
+                    digest.add(i.sha, commit)
+                    continue
+                yield "Committed on %s - %s - %s" % (self._output.green(commit.committer.date),
+                                                     self._output.blue(commit.committer.name),
+                                                     commit.message)
+            if capped:
+                break
+            backfill.done(start, end)
+            if window is not None:
+                backfills[repo.full_name] = backfill.to_json()
+                if self.__persist:
+                    self._memory.save()
+        if digest is not None:
+            for line in digest.lines(self._output):
+                yield line
+        if capped:
+            yield "More commits not listed, see --max-commits"
+        backfills.pop(repo.full_name, None)
+        self._memory.repos.update(repo.full_name, head_sha=head_sha, cursor=now)
+
+    def __has_been_pushed(self, repo, since):
+        """Returns string describing last push timestamp of 'repo''s last commit if after 'since'.
+        Returns None otherwise.
+        Remembers the repo's id and last push timestamp in self._memory.repos.
+        """
+        if repo.pushed_at is None: # never pushed
+            self._memory.repos.update(repo.full_name, id=repo.id)
+            return None
+        self._memory.repos.update(repo.full_name, id=repo.id,
+                                  pushed_at=impl.timestamp.to_epoch(repo.pushed_at))
         if repo.pushed_at >= since:
             return "Last commit pushed on " + self._output.green(repo.pushed_at)
 
     def __get_repo(self, full_name):
-        """Returns github repository. Raises if couldn't be found.
+        """Returns github repository, following renames. Raises if couldn't be found.
         """
         try:
-            return self.__github.get_repo(full_name)
+            repo = self.__github.get_repo(full_name)
+            if repo.full_name is None and "/repositories/" in repo.url:
+                # 301 Moved Permanently, i.e. renamed or transferred:
+                repo = self.__github.get_repo(int(repo.url.rsplit("/", 1)[1]))
+                self._output.echo("%s - Renamed to %s" % (self._output.red(full_name),
+                                                          self._output.red(repo.full_name)))
+                if full_name in self._memory.repos and repo.full_name not in self._memory.repos:
+                    self._memory.repos.rename(full_name, repo.full_name)
+            return repo
         except github.GithubException as e:
             if e.status == 404:
                 e.args += ("%s repo doesn't exist?" % (full_name),)
@@ -270,6 +602,40 @@ class Cli:
 
     _persist_option = "--persist"
 
+def _matches_any(full_name, globs):
+    """Returns True if repo 'full_name' matches any of the shell-style 'globs', ignoring case like
+    GitHub does.
+    """
+    return any(fnmatch.fnmatchcase(full_name.lower(), glob.lower()) for glob in globs)
+
+def _positive_int(string):
+    """Converts command-line argument 'string' to a strictly positive integer, see argparse.
+    """
+    value = int(string)
+    if value <= 0:
+        raise argparse.ArgumentTypeError("%s is not a positive integer" % (string))
+    return value
+
+def _unless_empty(commits):
+    """Yields 'commits', a github.PaginatedList.PaginatedList, or nothing if the repo is empty,
+    which GitHub answers with 409 Conflict.
+    """
+    try:
+        for commit in commits:
+            yield commit
+    except github.GithubException as e:
+        if e.status != 409:
+            raise
+
+def _is_repo_unavailable(e):
+    """Returns True if GitHub exception 'e' means that a repo got deleted or made private, as
+    opposed to e.g. the API rate limit being exceeded.
+    """
+    if e.status == 404:
+        return True
+    message = e.data.get("message", "") if isinstance(e.data, dict) else ""
+    return e.status == 403 and "rate limit" not in message.lower()
+
 def _send_output_by_mail_if_necessary(mail_sender, email_subject, output):
     """Returns True if an e-mail was sent.
     @param mail_sender: Instance of impl.mail.MailSender.
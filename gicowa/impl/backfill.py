@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+class Backfill:
+    """Splits a range of committer timestamps into time windows to be listed newest first, and
+    keeps track of the windows done so that an interrupted listing can be resumed.
+    All timestamps are UTC epoch seconds.
+    """
+    def __init__(self, since, until, size, data=None):
+        """
+        @param since: Oldest timestamp to consider, inclusive.
+        @param until: Newest timestamp to consider, inclusive.
+        @param size: Window size in seconds, positive. None for one single window.
+        @param data: Output of to_json() of an interrupted backfill. Ignored if it was for another
+                     'since'.
+        """
+        assert size is None or size > 0
+        self.since = since
+        self.count = 0 # number of commits listed so far, to be maintained by the caller
+        self.__until = until
+        self.__size = size
+
+        # Disjoint [low, high] ranges done so far, newest first. There are several of them when
+        # resuming, until the windows newer than the resumed ranges reach them:
+        self.__done = []
+        if data is not None and data["since"] == since:
+            self.count = data["count"]
+            if "done" in data:
+                self.__done = [list(done) for done in data["done"]]
+            elif data["low"] is not None: # written before several ranges were kept
+                self.__done = [[data["low"], data["high"]]]
+
+    def windows(self):
+        """Yields (start, end) pairs, newest first, covering [since, until] except what was done
+        before. done() should be called once each window has been processed.
+        """
+        end = self.__until
+        for low, high in list(self.__done) + [[self.since - 1, self.since - 1]]:
+            start = high + 1
+            while end >= start:
+                window_start = start if self.__size is None else max(start, end - self.__size + 1)
+                yield window_start, end
+                end = window_start - 1
+            end = min(end, low - 1)
+
+    def done(self, start, end):
+        """Marks window (start, end) as processed.
+        """
+        self.__done.append([start, end])
+        self.__done.sort(reverse=True)
+        merged = []
+        for low, high in self.__done:
+            if len(merged) and high + 1 >= merged[-1][0]:
+                merged[-1][0] = min(merged[-1][0], low)
+            else:
+                merged.append([low, high])
+        self.__done = merged
+
+    def to_json(self):
+        return {"since": self.since, "done": self.__done, "count": self.count}
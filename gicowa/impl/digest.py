@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+class Digest:
+    """Summary of the commits on a branch of a repo, built in one pass over them, newest first,
+    without keeping them all.
+    """
+    def __init__(self, repo_full_name, branch, max_messages):
+        """
+        @param max_messages: Maximum number of commit messages and of authors to be listed.
+        """
+        self.__repo_full_name = repo_full_name
+        self.__branch = branch
+        self.__max_messages = max_messages
+        self.__count = 0
+        # Author name -> number of commits. Authors rather than committers, as GitHub is the
+        # committer of everything merged through its web interface:
+        self.__authors = {}
+        self.__first = None # oldest committer timestamp
+        self.__last = None # newest committer timestamp
+        self.__newest_sha = None
+        self.__oldest_parent_sha = None # None if the oldest commit is a root commit
+        self.__messages = [] # first lines of the newest commit messages
+
+    def add(self, sha, commit):
+        """
+        @param commit: github.GitCommit.GitCommit
+        """
+        self.__count += 1
+        name = commit.author.name
+        self.__authors[name] = self.__authors.get(name, 0) + 1
+        date = commit.committer.date
+        if self.__first is None or date < self.__first:
+            self.__first = date
+        if self.__last is None or date > self.__last:
+            self.__last = date
+        if self.__newest_sha is None:
+            self.__newest_sha = sha
+        parents = commit.parents or []
+        self.__oldest_parent_sha = parents[0].sha if len(parents) else None
+        if len(self.__messages) < self.__max_messages:
+            self.__messages.append(commit.message.split("\n", 1)[0])
+
+    def lines(self, output):
+        """Returns the summary as a list of lines, empty if no commit was added.
+        @param output: Instance of impl.output.Output.
+        """
+        if not self.__count:
+            return []
+
+        authors = sorted(self.__authors, key=lambda name: (-self.__authors[name], name))
+        by = ", ".join(output.blue(name) for name in authors[:self.__max_messages])
+        if len(authors) > self.__max_messages:
+            by += " and %s more" % (len(authors) - self.__max_messages)
+        result = ["%s commit(s) on %s committed from %s to %s, authored by %s"
+                  % (self.__count, self.__branch, output.green(self.__first),
+                     output.green(self.__last), by)]
+        result += ["  " + message for message in self.__messages]
+        if self.__count > len(self.__messages):
+            result.append("  and %s more" % (self.__count - len(self.__messages)))
+        if self.__oldest_parent_sha is not None:
+            result.append("  https://github.com/%s/compare/%s...%s"
+                          % (self.__repo_full_name, self.__oldest_parent_sha, self.__newest_sha))
+        else: # nothing to compare with
+            result.append("  https://github.com/%s/commits/%s"
+                          % (self.__repo_full_name, self.__newest_sha))
+        return result
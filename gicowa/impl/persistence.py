@@ -4,10 +4,19 @@
 import json
 import os
 
+from repostate import RepoStates
+from watchlist import Watchlist
+
 class Memory:
     filename = "~/.gicowa"
 
-    def __init__(self):
+    def __init__(self, filename=None):
+        """
+        @param filename: File to load from and save to instead of ~/.gicowa.
+        """
+        if filename is not None:
+            self.filename = filename
+
         # e.g. {"lastwatchedcommits AurelienLourot": {"YYYY": "2015",
         #                                             "MM"  : "07",
         #                                             "DD"  : "04",
@@ -16,17 +25,52 @@ class Memory:
         #                                             "ss"  : "00"}}
         self.timestamps = {}
 
+        # Per-repo state, see impl.repostate:
+        self.repos = RepoStates()
+
+        # e.g. {"AurelienLourot": Watchlist()}
+        self.watchlists = {}
+
+        # e.g. {"lastwatchedcommits AurelienLourot": {"AurelienLourot/github-commit-watcher":
+        #                                             Backfill().to_json()}}
+        self.backfills = {}
+
+        # Watchers registered to 'gicowa serve', see impl.service.Service:
+        self.watchers = {}
+
         try:
             with open(os.path.expanduser(self.filename), "rb") as f:
                 try:
-                    self.timestamps = json.loads(f.read())
+                    data = json.loads(f.read())
                 except ValueError as e:
                     e.args += ("%s file damaged?" % (self.filename),)
                     raise
         except IOError:
             # Ignores when file doesn't exist yet
-            pass
+            return
+
+        if "timestamps" not in data:
+            # Written by gicowa <= 1.2.5, contains only the timestamps:
+            self.timestamps = data
+            return
+        self.timestamps = data["timestamps"]
+        self.repos = RepoStates.from_json(data.get("repos", {}))
+        self.watchlists = dict((username, Watchlist(watchlist))
+                               for username, watchlist in data.get("watchlists", {}).iteritems())
+        self.backfills = data.get("backfills", {})
+        self.watchers = data.get("watchers", {})
 
-    def save(self):
-        with open(os.path.expanduser(self.filename), "wb") as f:
-            f.write(json.dumps(self.timestamps, indent=2))
+    def save(self, filename=None):
+        """
+        @param filename: File to save to instead of self.filename.
+        """
+        data = {"timestamps": self.timestamps,
+                "repos": self.repos.to_json(),
+                "watchlists": dict((username, watchlist.to_json())
+                                   for username, watchlist in self.watchlists.iteritems()),
+                "backfills": dict((command, backfills)
+                                  for command, backfills in self.backfills.iteritems()
+                                  if backfills),
+                "watchers": self.watchers}
+        with open(os.path.expanduser(filename or self.filename), "wb") as f:
+            f.write(json.dumps(data, indent=2))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import httplib
+import json
+import os
+import re
+import time
+import urlparse
+
+from github.Requester import Requester
+
+# Request headers and URL parameters never written to disk:
+_secret_headers = ("authorization", "proxy-authorization")
+_secret_parameters = re.compile(r"\b(client_secret|access_token)=[^&]*")
+redacted = "<redacted>"
+
+class Recorder:
+    """Makes all GitHub API calls, i.e. all github.Requester.Requester instances created after
+    install(), save each request, response and timing to a directory.
+    """
+    def __init__(self, directory):
+        self.__directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.__count = len(_exchange_files(directory))
+
+    def install(self):
+        Requester.injectConnectionClasses(
+            lambda *args, **kwargs: _RecordingConnection(self, httplib.HTTPConnection(*args,
+                                                                                      **kwargs)),
+            lambda *args, **kwargs: _RecordingConnection(self, httplib.HTTPSConnection(*args,
+                                                                                       **kwargs)))
+
+    def uninstall(self):
+        Requester.resetConnectionClasses()
+
+    def save(self, exchange):
+        self.__count += 1
+        filename = os.path.join(self.__directory, "%06d.json" % (self.__count))
+        with open(filename, "wb") as f:
+            f.write(json.dumps(exchange, indent=2, sort_keys=True))
+
+class Player:
+    """Makes all GitHub API calls, i.e. all github.Requester.Requester instances created after
+    install(), get answered from a directory filled by a Recorder instead of the network.
+    """
+    def __init__(self, directory, latency=True):
+        """
+        @param latency: If True, each response is delayed as long as it originally took.
+        """
+        self.__directory = directory
+        self.__latency = latency
+
+        # e.g. {("GET", "/users/AurelienLourot"): [exchange1, exchange2]}
+        self.__exchanges = {}
+        for filename in _exchange_files(directory):
+            with open(os.path.join(directory, filename), "rb") as f:
+                try:
+                    exchange = json.loads(f.read())
+                except ValueError as e:
+                    e.args += ("%s file damaged?" % (filename),)
+                    raise
+            self.__exchanges.setdefault(_key(exchange["verb"], exchange["url"]), []).append(
+                exchange)
+
+    def install(self):
+        connection = lambda *args, **kwargs: _ReplayingConnection(self)
+        Requester.injectConnectionClasses(connection, connection)
+
+    def uninstall(self):
+        Requester.resetConnectionClasses()
+
+    def respond(self, verb, url):
+        """Returns the next recorded exchange for 'verb' 'url'.
+        Falls back to the next one on the same path if none has exactly the same URL, as URL
+        parameters like 'until' depend on when gicowa is run.
+        """
+        url = _redact_url(url)
+        try:
+            exchanges = self.__exchanges[_key(verb, url)]
+            index = next((i for i, exchange in enumerate(exchanges) if exchange["url"] == url), 0)
+            exchange = exchanges.pop(index)
+        except (KeyError, IndexError) as e:
+            e.args += ("%s %s not recorded in %s" % (verb, url, self.__directory),)
+            raise
+        if self.__latency:
+            time.sleep(exchange["elapsed"])
+        return exchange
+
+class _RecordingConnection:
+    """Implements the part of httplib.HTTPConnection's interface used by github.Requester and
+    records what goes through 'connection'.
+    """
+    def __init__(self, recorder, connection):
+        self.__recorder = recorder
+        self.__connection = connection
+        self.__exchange = None
+        self.__start = None
+
+    def set_tunnel(self, *args, **kwargs):
+        self.__connection.set_tunnel(*args, **kwargs)
+
+    def request(self, verb, url, input, headers):
+        self.__exchange = {"verb": verb,
+                           "url": _redact_url(url),
+                           "request_headers": dict(
+                               (name, redacted if name.lower() in _secret_headers else value)
+                               for name, value in headers.iteritems()),
+                           "input": input}
+        self.__start = time.time()
+        self.__connection.request(verb, url, input, headers)
+
+    def getresponse(self):
+        response = self.__connection.getresponse()
+        output = response.read()
+        self.__exchange["elapsed"] = time.time() - self.__start
+        self.__exchange["status"] = response.status
+        self.__exchange["response_headers"] = response.getheaders()
+        self.__exchange["output"] = output
+        self.__recorder.save(self.__exchange)
+        return _Response(self.__exchange)
+
+    def close(self):
+        self.__connection.close()
+
+class _ReplayingConnection:
+    """Implements the part of httplib.HTTPConnection's interface used by github.Requester by
+    asking 'player' for responses.
+    """
+    def __init__(self, player):
+        self.__player = player
+        self.__exchange = None
+
+    def set_tunnel(self, *args, **kwargs):
+        pass
+
+    def request(self, verb, url, input, headers):
+        self.__exchange = self.__player.respond(verb, url)
+
+    def getresponse(self):
+        return _Response(self.__exchange)
+
+    def close(self):
+        pass
+
+class _Response:
+    """Implements the part of httplib.HTTPResponse's interface used by github.Requester.
+    """
+    def __init__(self, exchange):
+        self.status = exchange["status"]
+        self.__headers = [tuple(header) for header in exchange["response_headers"]]
+        self.__output = exchange["output"]
+
+    def getheaders(self):
+        return self.__headers
+
+    def read(self):
+        return self.__output
+
+def memory_filename(directory):
+    """Returns the file of 'directory' where the memory, see impl.persistence.Memory, gets saved as
+    it was when recording started, as the requests made depend on it.
+    """
+    return os.path.join(directory, ".gicowa")
+
+def _exchange_files(directory):
+    return sorted(filename for filename in os.listdir(directory) if filename.endswith(".json"))
+
+def _redact_url(url):
+    return _secret_parameters.sub(lambda match: match.group(1) + "=" + redacted, url)
+
+def _key(verb, url):
+    return verb, urlparse.urlsplit(url).path
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import array
+import binascii
+import heapq
+
+class RepoState(object):
+    """Snapshot of one row of a RepoStates table. All timestamps are UTC epoch seconds, 0 meaning
+    unknown.
+    """
+    __slots__ = ("id", "name", "pushed_at", "head_sha", "cursor", "next_poll", "failures",
+                 "status")
+
+    def __init__(self, id, name, pushed_at, head_sha, cursor, next_poll, failures, status):
+        self.id = id
+        self.name = name
+        self.pushed_at = pushed_at
+        self.head_sha = head_sha
+        self.cursor = cursor
+        self.next_poll = next_poll
+        self.failures = failures # number of consecutive failed attempts to poll the repo
+        self.status = status # HTTP status of the last failed attempt
+
+class RepoStates:
+    """Compact table of per-repo state, keyed by repo full name.
+
+    Integer columns are stored in arrays and head SHAs as 20 raw bytes each in a single bytearray,
+    so that a row costs a few dozen bytes besides its name. A heap on next-poll time allows
+    scheduling in O(log n).
+    """
+    def __init__(self):
+        self.__rows = {} # full name -> row index
+        self.__names = []
+        self.__ids = array.array("l")
+        self.__pushed_at = array.array("l")
+        self.__cursors = array.array("l")
+        self.__next_polls = array.array("l")
+        self.__shas = bytearray()
+        self.__failures = array.array("H")
+        self.__statuses = array.array("H")
+
+        # Heap of next_poll << _ROW_BITS | row. Entries whose next_poll doesn't match the row's
+        # anymore are stale and get skipped lazily:
+        self.__schedule = []
+
+    def __len__(self):
+        return len(self.__names)
+
+    def __contains__(self, name):
+        return name in self.__rows
+
+    def __iter__(self):
+        return iter(self.__names)
+
+    def add(self, name, id=0):
+        """Adds a row for 'name' if not present yet. Returns its row index.
+        """
+        try:
+            return self.__rows[name]
+        except KeyError:
+            pass
+        row = len(self.__names)
+        self.__rows[name] = row
+        self.__names.append(name)
+        self.__ids.append(id)
+        self.__pushed_at.append(0)
+        self.__cursors.append(0)
+        self.__next_polls.append(0)
+        self.__shas.extend(self._NO_SHA)
+        self.__failures.append(0)
+        self.__statuses.append(0)
+        return row
+
+    def get(self, name):
+        """Returns a RepoState. Raises KeyError if 'name' is unknown.
+        """
+        row = self.__rows[name]
+        return RepoState(self.__ids[row], name, self.__pushed_at[row], self.__head_sha(row),
+                         self.__cursors[row], self.__next_polls[row], self.__failures[row],
+                         self.__statuses[row])
+
+    def rename(self, name, new_name):
+        """Makes 'name''s row 'new_name''s. Raises KeyError if 'name' is unknown.
+        """
+        row = self.__rows.pop(name)
+        self.__rows[new_name] = row
+        self.__names[row] = new_name
+
+    def update(self, name, id=None, pushed_at=None, head_sha=None, cursor=None):
+        """Sets the given fields of 'name''s row, adding the row if necessary.
+        @param head_sha: Hexadecimal string.
+        """
+        row = self.add(name)
+        if id is not None:
+            self.__ids[row] = id
+        if pushed_at is not None:
+            self.__pushed_at[row] = pushed_at
+        if head_sha is not None:
+            self.__shas[row * 20:(row + 1) * 20] = binascii.unhexlify(head_sha)
+        if cursor is not None:
+            self.__cursors[row] = cursor
+
+    def fail(self, name, status, now):
+        """Records a failed attempt to poll 'name' with HTTP 'status' at time 'now', and schedules
+        the next attempt with an exponential backoff. Returns the time of the next attempt.
+        """
+        row = self.add(name)
+        self.__failures[row] = min(self.__failures[row] + 1, self._MAX_FAILURES)
+        self.__statuses[row] = status
+        next_poll = now + min(self._RETRY_DELAY << (self.__failures[row] - 1),
+                              self._MAX_RETRY_DELAY)
+        self.schedule(name, next_poll)
+        return next_poll
+
+    def recover(self, name):
+        """Records a successful attempt to poll 'name' if known.
+        """
+        row = self.__rows.get(name)
+        if row is not None:
+            self.__failures[row] = 0
+            self.__statuses[row] = 0
+
+    def is_failing(self, name, now):
+        """Returns True if 'name' failed to be polled last time and shouldn't be attempted again
+        before a time after 'now'.
+        """
+        row = self.__rows.get(name)
+        return row is not None and self.__failures[row] > 0 and self.__next_polls[row] > now
+
+    def schedule(self, name, next_poll):
+        """Sets the time at which 'name' should be polled next, adding the row if necessary.
+        """
+        row = self.add(name)
+        self.__next_polls[row] = next_poll
+        heapq.heappush(self.__schedule, next_poll << self._ROW_BITS | row)
+        if len(self.__schedule) > 2 * len(self.__names):
+            self.__rebuild_schedule()
+
+    def next_due(self):
+        """Returns (next_poll, name) of the row to be polled first, or None if nothing is
+        scheduled.
+        """
+        while self.__schedule:
+            next_poll, row = self.__decode(self.__schedule[0])
+            if next_poll == self.__next_polls[row]:
+                return next_poll, self.__names[row]
+            heapq.heappop(self.__schedule)
+        return None
+
+    def pop_due(self, now):
+        """Yields names of all rows with a next-poll time not after 'now', earliest first, and
+        unschedules them. Callers are expected to schedule them again once polled.
+        """
+        while True:
+            due = self.next_due()
+            if due is None or due[0] > now:
+                return
+            heapq.heappop(self.__schedule)
+            self.__next_polls[self.__rows[due[1]]] = 0
+            yield due[1]
+
+    def to_json(self):
+        """Returns a JSON-serializable representation, see from_json().
+        """
+        return dict((name, [self.__ids[row], self.__pushed_at[row], self.__head_sha(row),
+                            self.__cursors[row], self.__next_polls[row], self.__failures[row],
+                            self.__statuses[row]])
+                    for row, name in enumerate(self.__names))
+
+    @classmethod
+    def from_json(cls, data):
+        """Builds from the output of to_json().
+        """
+        result = cls()
+        for name, (id, pushed_at, head_sha, cursor, next_poll, failures, status) \
+                in data.iteritems():
+            row = result.add(name)
+            result.update(name, id, pushed_at, head_sha or None, cursor)
+            if next_poll:
+                result.schedule(name, next_poll)
+            result.__failures[row] = failures
+            result.__statuses[row] = status
+        return result
+
+    def __head_sha(self, row):
+        sha = self.__shas[row * 20:(row + 1) * 20]
+        return "" if sha == self._NO_SHA else binascii.hexlify(sha)
+
+    def __decode(self, entry):
+        return entry >> self._ROW_BITS, entry & ((1 << self._ROW_BITS) - 1)
+
+    def __rebuild_schedule(self):
+        self.__schedule = [next_poll << self._ROW_BITS | row
+                           for row, next_poll in enumerate(self.__next_polls) if next_poll]
+        heapq.heapify(self.__schedule)
+
+    _NO_SHA = bytearray(20)
+    _ROW_BITS = 24
+    _MAX_FAILURES = 64
+    _RETRY_DELAY = 3600 # seconds to wait after a first failure, doubled after each next one
+    _MAX_RETRY_DELAY = 7 * 24 * 3600
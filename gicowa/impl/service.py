@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import BaseHTTPServer
+import json
+import time
+
+class Service:
+    """Watches repos on behalf of several watchers at once. Each repo is polled once for all the
+    watchers interested in it, and what got pushed is then sent to each of them.
+
+    Everything happens in one thread: an event loop alternates between answering the local HTTP
+    API, see make_server(), and polling the repos which are due according to the schedule of the
+    shared impl.repostate.RepoStates.
+    """
+    def __init__(self, watchers, repos, poll, resolve, notify, log, interval):
+        """
+        @param watchers: Dictionary of all registered watchers, modified in place, e.g.
+                         {"1": {"username": "AurelienLourot", "mailto": "me@mydomain.com"},
+                          "2": {"repos": ["brillout/FasterWeb"], "mailto": "you@yourdomain.com"}}
+        @param repos: Instance of impl.repostate.RepoStates, whose cursors and schedule are shared
+                      by all watchers.
+        @param poll: Function(repo_full_name, since) returning the lines describing what got
+                     pushed on a repo since 'since', in UTC epoch seconds.
+        @param resolve: Function(username) returning the repos watched by a GitHub user. Called
+                        again for each such watcher every 'interval' seconds.
+        @param notify: Function(watcher, lines) sending 'lines' to a watcher.
+        @param log: Function implementing the same interface as print().
+        @param interval: Number of seconds between two polls of the same repo.
+        """
+        self.__watchers = watchers
+        self.__repos = repos
+        self.__poll = poll
+        self.__resolve = resolve
+        self.__notify = notify
+        self.__log = log
+        self.__interval = interval
+
+        self.__resolved = {} # watcher id -> tuple of watched repos
+        self.__subscribers = {} # repo full name -> set of watcher ids
+        self.__watchers_changed = True # since self.__resolved was last updated
+        self.__resolve_at = {} # watcher id -> time its username should be resolved again
+
+    def register(self, watcher):
+        """Adds a watcher. Returns its id. Raises ValueError if 'watcher' is malformed.
+        """
+        if not _is_valid(watcher):
+            raise ValueError("A watcher needs a 'mailto' and either a 'username' or a non-empty "
+                             + "list of repo names as 'repos'.")
+        id = str(max([int(id) for id in self.__watchers] or [0]) + 1)
+        self.__watchers[id] = dict((key, watcher[key])
+                                   for key in ("username", "repos", "mailto")
+                                   if watcher.get(key) is not None)
+        self.__watchers_changed = True
+        return id
+
+    def unregister(self, id):
+        """Removes a watcher. Returns False if there was no watcher with that id.
+        """
+        if self.__watchers.pop(id, None) is None:
+            return False
+        self.__watchers_changed = True
+        return True
+
+    def tick(self, now):
+        """Polls all repos due at time 'now' and notifies their watchers.
+        Returns True if anything worth persisting changed, i.e. watchers or repo states.
+        """
+        changed = self.__update_subscribers(now)
+
+        lines = {} # watcher id -> lines to be sent
+        for name in list(self.__repos.pop_due(now)):
+            changed = True
+            subscribers = self.__subscribers.get(name)
+            if not subscribers:
+                continue # not watched anymore, thus not scheduled anymore
+            state = self.__repos.get(name)
+            try:
+                if state.cursor:
+                    pushed = self.__poll(name, state.cursor)
+                    for id in subscribers:
+                        lines.setdefault(id, []).extend(pushed)
+                # else first time this repo gets polled, start from now.
+            except Exception as e:
+                next_poll = self.__repos.fail(name, getattr(e, "status", 0), now)
+                self.__log("%s failed, next attempt at %s: %s" % (name, next_poll, e))
+                continue
+            self.__repos.update(name, cursor=now)
+            self.__repos.recover(name)
+            self.__repos.schedule(name, now + self.__interval)
+
+        for id, watcher_lines in lines.iteritems():
+            if not len(watcher_lines):
+                continue
+            try:
+                self.__notify(self.__watchers[id], watcher_lines)
+            except Exception as e:
+                self.__log("Couldn't notify watcher %s: %s" % (id, e))
+        return changed
+
+    def timeout(self, now):
+        """Returns the number of seconds from 'now' until the next repo is due or the next username
+        should be resolved again.
+        """
+        due = self.__resolve_at.values()
+        next_due = self.__repos.next_due()
+        if next_due is not None:
+            due.append(next_due[0])
+        return self.__interval if not len(due) else max(0, min(due) - now)
+
+    def serve_forever(self, server, checkpoint=lambda: None):
+        """Runs the event loop.
+        @param server: Output of make_server().
+        @param checkpoint: Function called after each tick which changed something, e.g. for
+                           persisting state.
+        """
+        while True:
+            if self.tick(int(time.time())):
+                checkpoint()
+            server.timeout = self.timeout(time.time())
+            server.handle_request()
+
+    def make_server(self, host, port):
+        """Returns a BaseHTTPServer.HTTPServer implementing the following API:
+            GET /watchers             lists all watchers
+            POST /watchers            registers the watcher in the JSON request body
+            DELETE /watchers/<id>     unregisters a watcher
+        """
+        register = self.register
+        unregister = self.unregister
+        watchers = self.__watchers
+        log = self.__log
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/watchers":
+                    return self.__respond(404, {"message": "Not Found"})
+                self.__respond(200, watchers)
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/watchers":
+                    return self.__respond(404, {"message": "Not Found"})
+                try:
+                    length = int(self.headers.getheader("content-length", 0))
+                    id = register(json.loads(self.rfile.read(length)))
+                except ValueError as e:
+                    return self.__respond(400, {"message": unicode(e)})
+                self.__respond(201, {"id": id})
+
+            def do_DELETE(self):
+                prefix = "/watchers/"
+                if not self.path.startswith(prefix) \
+                        or not unregister(self.path[len(prefix):]):
+                    return self.__respond(404, {"message": "Not Found"})
+                self.__respond(200, {})
+
+            def log_message(self, format, *args):
+                log(format % args)
+
+            def __respond(self, status, data):
+                body = json.dumps(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", len(body))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return BaseHTTPServer.HTTPServer((host, port), Handler)
+
+    def __update_subscribers(self, now):
+        """Updates self.__subscribers after watchers changed or usernames are due to be resolved
+        again, and schedules repos which weren't watched yet. Returns True if watchers or what
+        they watch changed.
+        Each username gets resolved every self.__interval seconds from its registration, so that
+        refreshing all watchlists is spread over time.
+        """
+        if not self.__watchers_changed \
+                and not any(at <= now for at in self.__resolve_at.itervalues()):
+            return False
+        watchers_changed = self.__watchers_changed
+        self.__watchers_changed = False
+
+        resolved = {}
+        for id, watcher in self.__watchers.iteritems():
+            if id in self.__resolved and self.__resolve_at.get(id, now + 1) > now:
+                resolved[id] = self.__resolved[id] # up to date
+                continue
+            if not _is_valid(watcher):
+                # e.g. persisted by an older version, mustn't stop the others from being served:
+                if id not in self.__resolved:
+                    self.__log("Ignored malformed watcher %s: %s" % (id, watcher))
+                resolved[id] = ()
+                continue
+            if watcher.get("repos") is not None:
+                resolved[id] = tuple(watcher["repos"])
+                continue
+            self.__resolve_at[id] = now + self.__interval
+            try:
+                resolved[id] = tuple(self.__resolve(watcher["username"]))
+            except Exception as e:
+                self.__log("Couldn't get repos watched by %s: %s" % (watcher["username"], e))
+                resolved[id] = self.__resolved.get(id, ())
+        for id in set(self.__resolve_at) - set(resolved): # unregistered
+            del self.__resolve_at[id]
+        if resolved == self.__resolved:
+            return watchers_changed
+
+        self.__resolved = resolved
+        self.__subscribers = {}
+        for id, repos in resolved.iteritems():
+            for name in repos:
+                self.__subscribers.setdefault(name, set()).add(id)
+        for name in self.__subscribers:
+            if name not in self.__repos or not self.__repos.get(name).next_poll:
+                self.__repos.schedule(name, now)
+        return True
+
+def _is_valid(watcher):
+    """Returns True if 'watcher', e.g. as decoded from a request, has a 'mailto' and either a
+    'username' or a non-empty list of repo names as 'repos'.
+    """
+    if not isinstance(watcher, dict) or not isinstance(watcher.get("mailto"), basestring):
+        return False
+    if ("username" in watcher) == ("repos" in watcher): # even if one of them is null
+        return False
+    if "username" in watcher:
+        username = watcher["username"]
+        return isinstance(username, basestring) and len(username) > 0
+    repos = watcher["repos"]
+    return isinstance(repos, list) and len(repos) > 0 \
+        and all(isinstance(repo, basestring) for repo in repos)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import calendar
 import datetime
 
 import encoding
@@ -49,3 +50,13 @@ class Timestamp:
         except ValueError as e:
             e.args += ("Timestamp malformed?",)
             raise
+
+    def to_epoch(self):
+        """Returns the number of seconds since 1970-01-01 00:00:00 UTC.
+        """
+        return to_epoch(self.to_datetime())
+
+def to_epoch(utc_datetime):
+    """Returns the number of seconds between 1970-01-01 00:00:00 UTC and 'utc_datetime'.
+    """
+    return calendar.timegm(utc_datetime.utctimetuple())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+per_page = 100 # maximum allowed by GitHub
+
+class Watchlist:
+    """List of repos watched by a user, cached between runs.
+
+    Each page of the list is stored with its ETag so that a refresh sends conditional requests,
+    which cost nothing against the GitHub API rate limit when the page hasn't changed.
+    """
+    def __init__(self, data=None):
+        """
+        @param data: Output of to_json(), or None for an empty, outdated watchlist.
+        """
+        if data is None:
+            data = {"fetched": 0, "pages": []}
+        self.fetched = data["fetched"]
+        self.__pages = data["pages"] # e.g. [["etag1", ["repo1", "repo2"]], ["etag2", ["repo3"]]]
+
+    @property
+    def repos(self):
+        return [repo for page in self.__pages for repo in page[1]]
+
+    def is_outdated(self, ttl):
+        """Returns True if fetched more than 'ttl' seconds ago.
+        """
+        return time.time() - self.fetched >= ttl
+
+    def refresh(self, requester, url):
+        """Fetches the list again from 'url' with 'requester', a github.Requester.Requester.
+        Returns the set of repos that weren't in the list before.
+        """
+        old_repos = set(self.repos)
+        pages = []
+        while True:
+            headers = {}
+            if len(pages) < len(self.__pages) and self.__pages[len(pages)][0]:
+                headers["If-None-Match"] = self.__pages[len(pages)][0]
+            response_headers, data = requester.requestJsonAndCheck(
+                "GET", url, {"per_page": per_page, "page": len(pages) + 1}, headers)
+            if data is None: # 304 Not Modified
+                page = self.__pages[len(pages)]
+            else:
+                page = [response_headers.get("etag", ""), [repo["full_name"] for repo in data]]
+            pages.append(page)
+            if len(page[1]) < per_page:
+                break
+
+        self.__pages = pages
+        self.fetched = int(time.time())
+        return set(self.repos) - old_repos
+
+    def to_json(self):
+        return {"fetched": self.fetched, "pages": self.__pages}
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import gicowa.impl.backfill as backfill
+
+class BackfillTests(unittest.TestCase):
+    def test_windows(self):
+        my_backfill = backfill.Backfill(100, 349, 100)
+        self.assertEqual(list(my_backfill.windows()), [(250, 349), (150, 249), (100, 149)])
+
+    def test_single_window(self):
+        my_backfill = backfill.Backfill(100, 349, None)
+        self.assertEqual(list(my_backfill.windows()), [(100, 349)])
+
+    def test_bad_size(self):
+        for size in (0, -100):
+            with self.assertRaises(AssertionError):
+                backfill.Backfill(100, 349, size)
+
+    def test_resume(self):
+        my_backfill = backfill.Backfill(100, 349, 100)
+        windows = my_backfill.windows()
+        for window in (next(windows), next(windows)):
+            my_backfill.done(*window)
+        my_backfill.count = 42
+        data = my_backfill.to_json()
+        self.assertEqual(data, {"since": 100, "done": [[150, 349]], "count": 42})
+
+        # Interrupted here, resumed later:
+        my_backfill = backfill.Backfill(100, 549, 100, data)
+        self.assertEqual(my_backfill.count, 42)
+        windows = list(my_backfill.windows())
+        self.assertEqual(windows, [(450, 549), (350, 449), (100, 149)])
+        for window in windows[:2]:
+            my_backfill.done(*window)
+        self.assertEqual(my_backfill.to_json()["done"], [[150, 549]])
+
+    def test_resume_twice(self):
+        data = {"since": 100, "done": [[801, 1000]], "count": 5}
+        my_backfill = backfill.Backfill(100, 1500, 100, data)
+        windows = my_backfill.windows()
+        for i in xrange(3):
+            my_backfill.done(*next(windows))
+            my_backfill.count += 1
+        data = my_backfill.to_json()
+        self.assertEqual(data, {"since": 100, "done": [[1201, 1500], [801, 1000]], "count": 8})
+
+        # Interrupted again inside the windows newer than the resumed range:
+        my_backfill = backfill.Backfill(100, 1600, 100, data)
+        windows = list(my_backfill.windows())
+        self.assertEqual(windows[:4], [(1501, 1600), (1101, 1200), (1001, 1100), (701, 800)])
+        for window in windows:
+            my_backfill.done(*window)
+        self.assertEqual(my_backfill.to_json()["done"], [[100, 1600]])
+
+    def test_resume_old_format(self):
+        data = {"since": 100, "low": 150, "high": 349, "count": 42}
+        my_backfill = backfill.Backfill(100, 349, 100, data)
+        self.assertEqual(list(my_backfill.windows()), [(100, 149)])
+
+    def test_resume_other_since(self):
+        data = {"since": 100, "low": 150, "high": 349, "count": 42}
+        my_backfill = backfill.Backfill(0, 349, None, data)
+        self.assertEqual(my_backfill.count, 0)
+        self.assertEqual(list(my_backfill.windows()), [(0, 349)])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import gicowa.impl.digest as digest
+import gicowa.impl.output as output
+
+class MockCommit:
+    def __init__(self, name, date, message, parent_sha="myParentSha"):
+        self.author = lambda: None # ~ object with no properties (yet)
+        self.author.name = name
+        self.committer = lambda: None
+        self.committer.name = "GitHub" # e.g. merged through the web interface
+        self.committer.date = date
+        self.message = message
+        self.parents = []
+        if parent_sha is not None:
+            parent = lambda: None
+            parent.sha = parent_sha
+            self.parents.append(parent)
+
+class DigestTests(unittest.TestCase):
+    def test_lines(self):
+        my_digest = digest.Digest("myRepo", "myBranch", 2)
+        my_digest.add("sha3", MockCommit("myAuthor1", "2015-10-11 20:30:00", "myMessage3"))
+        my_digest.add("sha2", MockCommit("myAuthor2", "2015-10-11 20:20:00",
+                                         "myMessage2\n\nmyDetails"))
+        my_digest.add("sha1", MockCommit("myAuthor2", "2015-10-11 20:10:00", "myMessage1"))
+        my_digest.add("sha0", MockCommit("myAuthor3", "2015-10-11 20:00:00", "myMessage0",
+                                         "sha00"))
+        out = output.Output(None)
+        out.colored = False
+        self.assertEqual(my_digest.lines(out), [
+            "4 commit(s) on myBranch committed from 2015-10-11 20:00:00 to 2015-10-11 20:30:00, "
+            + "authored by myAuthor2, myAuthor1 and 1 more",
+            "  myMessage3",
+            "  myMessage2",
+            "  and 2 more",
+            "  https://github.com/myRepo/compare/sha00...sha3"])
+
+    def test_root_commit(self):
+        my_digest = digest.Digest("myRepo", "myBranch", 2)
+        my_digest.add("sha1", MockCommit("myAuthor", "2015-10-11 20:10:00", "myMessage1"))
+        my_digest.add("sha0", MockCommit("myAuthor", "2015-10-11 20:00:00", "myMessage0", None))
+        self.assertEqual(my_digest.lines(output.Output(None))[-1],
+                         "  https://github.com/myRepo/commits/sha1")
+
+    def test_no_commit(self):
+        self.assertEqual(digest.Digest("myRepo", "myBranch", 2).lines(output.Output(None)), [])
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import codecs
+import datetime
 import mock
 import os
 import sys
@@ -11,7 +12,9 @@ import github
 import gicowa.gicowa as gcw
 import gicowa.impl.mail as mail
 import gicowa.impl.output as output
+import gicowa.impl.repostate as repostate
 import gicowa.impl.timestamp as timestamp
+import gicowa.impl.watchlist as watchlist
 
 class MockPrint:
     def __init__(self):
@@ -24,19 +27,26 @@ class GicowaTests(unittest.TestCase):
     def __init__(self, *args, **kwargs):
         super(GicowaTests, self).__init__(*args, **kwargs)
         self.__mock_github = mock.Mock()
+        self.__commit_count = 1 # per repo and call to get_commits()
         self.__mock_github_user = mock.Mock()
 
     def setUp(self):
         mock_committer = lambda: None # ~ object with no properties (yet)
         mock_committer.name = "myCommitter"
         mock_committer.date = "myDate"
+        mock_author = lambda: None
+        mock_author.name = "myAuthor"
         mock_commit = lambda: None # ~ object with no properties (yet)
+        mock_commit.author = mock_author
         mock_commit.committer = mock_committer
         mock_commit.message = "myMessage"
-        mock_commit.sha = "mySha"
+        mock_parent = lambda: None
+        mock_parent.sha = "fedcba9876543210fedcba9876543210fedcba98"
+        mock_commit.parents = [mock_parent]
+        mock_commit.sha = "0123456789abcdef0123456789abcdef01234567"
 
-        def get_commits(since):
-            return (mock_commit,)
+        def get_commits(since, until=None):
+            return (mock_commit, mock_commit)[:self.__commit_count]
 
         def get_git_commit(sha):
             return mock_commit
@@ -45,6 +55,8 @@ class GicowaTests(unittest.TestCase):
         for i in xrange(1, 3+1):
             repo = mock.Mock()
             repo.full_name = "mySubscription" + str(i)
+            repo.id = i
+            repo.default_branch = "master"
             repo.pushed_at = timestamp.Timestamp({"YYYY": 2015,
                                                   "MM":   10,
                                                   "DD":   11,
@@ -60,7 +72,14 @@ class GicowaTests(unittest.TestCase):
                 if repo.full_name == full_name:
                     return repo
 
-        self.__mock_github_user.get_subscriptions.return_value = repos
+        self.__subscriptions = repos
+
+        def request_subscriptions(verb, url, parameters, headers):
+            return {"etag": '"myEtag"'}, [{"full_name": repo.full_name}
+                                          for repo in self.__subscriptions]
+
+        self.__mock_github_user.url = "/users/myUsername"
+        self.__mock_github_user._requester.requestJsonAndCheck = request_subscriptions
         self.__mock_github.get_user.return_value = self.__mock_github_user
         self.__mock_github.get_repo = get_repo
 
@@ -146,6 +165,233 @@ class GicowaTests(unittest.TestCase):
         actual = mock_stdout.printed
         self.assertEqual(actual, expected)
 
+    @mock.patch("github.Github")
+    def test_lastwatchedcommits_never_pushed(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        self.__subscriptions[1].pushed_at = None
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "lastwatchedcommits", "myUsername", "since", "2015", "10", "11", "20",
+             "08", "00"), mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastwatchedcommits myUsername since 2015-10-11 20:08:00\n" \
+                 + "mySubscription1 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription1 - Committed on myDate - myCommitter - myMessage\n" \
+                 + "mySubscription2 - Committed on myDate - myCommitter - myMessage\n" \
+                 + "mySubscription3 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription3 - Committed on myDate - myCommitter - myMessage\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+        self.assertEqual(cli._memory.repos.get("mySubscription2").pushed_at, 0)
+
+    @mock.patch("github.Github")
+    def test_max_commits(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        self.__commit_count = 2
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "--max-commits", "1", "lastrepocommits", "mySubscription1", "since",
+             "2015", "10", "11", "20", "08", "00"), mail.MailSender(),
+            output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastrepocommits mySubscription1 since 2015-10-11 20:08:00\n" \
+                 + "Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "Committed on myDate - myCommitter - myMessage\n" \
+                 + "More commits not listed, see --max-commits\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+
+    @mock.patch("gicowa.impl.persistence.Memory.save")
+    @mock.patch("github.Github")
+    def test_window(self, mock_github_constructor, mock_save):
+        mock_github_constructor.return_value = self.__mock_github
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "--persist", "--window", "1", "--max-commits", "2", "lastrepocommits",
+             "mySubscription1", "since", "2015", "10", "11", "20", "08", "00"), mail.MailSender(),
+            output.Output(mock_stdout.do_print))
+
+        checkpoints = []
+        mock_save.side_effect = lambda: checkpoints.append(
+            dict(cli._memory.backfills["lastrepocommits mySubscription1"]))
+        cli.run()
+        expected = "lastrepocommits mySubscription1 since 2015-10-11 20:08:00\n" \
+                 + "Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "Committed on myDate - myCommitter - myMessage\n" \
+                 + "Committed on myDate - myCommitter - myMessage\n" \
+                 + "More commits not listed, see --max-commits\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+        # Checkpointed after each window, cleaned up at the end:
+        self.assertEqual([checkpoint["mySubscription1"]["count"]
+                          for checkpoint in checkpoints[:2]], [1, 2])
+        self.assertEqual(checkpoints[2], {})
+
+    @mock.patch("sys.stderr")
+    def test_not_positive(self, mock_stderr):
+        for option, value in (("--window", "0"), ("--window", "-1"), ("--max-commits", "0"),
+                              ("--summary-messages", "0")):
+            cli = gcw.Cli((option, value, "lastrepocommits", "mySubscription1", "since", "2015",
+                           "10", "11", "20", "08", "00"), mail.MailSender(),
+                          output.Output(MockPrint().do_print))
+            with self.assertRaises(SystemExit):
+                cli.run()
+
+    @mock.patch("github.Github")
+    def test_lastwatchedcommits_new_subscription(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(("--no-color", "lastwatchedcommits", "myUsername", "sincelast"),
+                      mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli._memory.timestamps = {"lastwatchedcommits myUsername": {"YYYY": 2015,
+                                                                    "MM":   10,
+                                                                    "DD":   11,
+                                                                    "hh":   20,
+                                                                    "mm":   8,
+                                                                    "ss":   0}}
+        cli._memory.watchlists = {"myUsername": watchlist.Watchlist(
+            {"fetched": 1444594944, "pages": [['"myEtag"', ["mySubscription1",
+                                                             "mySubscription2"]]]})}
+        cli.run()
+        expected = "lastwatchedcommits myUsername since 2015-10-11 20:08:00\n" \
+                 + "mySubscription1 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription1 - Committed on myDate - myCommitter - myMessage\n" \
+                 + "mySubscription2 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription2 - Committed on myDate - myCommitter - myMessage\n" \
+                 + "mySubscription3 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription3 - Committed on myDate - myCommitter - myMessage\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+
+    @mock.patch("github.Github")
+    def test_summary(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        self.__commit_count = 2
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "--summary", "--summary-messages", "1", "--include", "mySubscription1",
+             "lastwatchedcommits", "myUsername", "since", "2015", "10", "11", "20", "08", "00"),
+            mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastwatchedcommits myUsername since 2015-10-11 20:08:00\n" \
+                 + "mySubscription1 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription1 - 2 commit(s) on master committed from myDate to myDate, " \
+                 + "authored by myAuthor\n" \
+                 + "mySubscription1 -   myMessage\n" \
+                 + "mySubscription1 -   and 1 more\n" \
+                 + "mySubscription1 -   https://github.com/mySubscription1/compare/%s...%s\n" \
+                 % ("fedcba9876543210fedcba9876543210fedcba98",
+                    "0123456789abcdef0123456789abcdef01234567")
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+
+    def __mock_org(self, failures={}):
+        """Makes the mocked GitHub API serve organization 'myOrg' with 3 repos pushed at different
+        times, each with one commit.
+        @param failures: e.g. {"/repos/myOrg/myRepo1/commits": (409, "Git Repository is empty.")}
+        """
+        requests = []
+
+        def request(verb, url, parameters=None, headers=None):
+            requests.append(url)
+            if url in failures:
+                status, message = failures[url]
+                raise github.GithubException(status, {"message": message})
+            if url == "/orgs/myOrg/repos":
+                return {}, [{"full_name": "myOrg/myRepo%s" % i,
+                             "id": i,
+                             "url": "/repos/myOrg/myRepo%s" % i,
+                             "pushed_at": "2015-10-11T2%s:00:00Z" % (3 - i)} for i in xrange(1, 4)]
+            if url.endswith("/commits"):
+                return {}, [{"sha": "0123456789abcdef0123456789abcdef01234567"}]
+            return {}, {"committer": {"name": "myCommitter", "date": "2015-10-11T20:30:00Z"},
+                        "message": "myMessage"}
+
+        self.__mock_github_user._requester.requestJsonAndCheck = request
+        return requests
+
+    @mock.patch("github.Github")
+    def test_lastorgcommits(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        requests = self.__mock_org()
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "lastorgcommits", "myOrg", "since", "2015", "10", "11", "20", "30",
+             "00"), mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastorgcommits myOrg since 2015-10-11 20:30:00\n" \
+                 + "myOrg/myRepo1 - Last commit pushed on 2015-10-11 22:00:00\n" \
+                 + "myOrg/myRepo1 - Committed on 2015-10-11 20:30:00 - myCommitter - myMessage\n" \
+                 + "myOrg/myRepo2 - Last commit pushed on 2015-10-11 21:00:00\n" \
+                 + "myOrg/myRepo2 - Committed on 2015-10-11 20:30:00 - myCommitter - myMessage\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+        self.assertNotIn("/repos/myOrg/myRepo3/commits", requests)
+
+    @mock.patch("github.Github")
+    def test_lastorgcommits_unavailable(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        self.__mock_org({"/repos/myOrg/myRepo1/commits": (409, "Git Repository is empty."),
+                         "/repos/myOrg/myRepo2/commits": (403, "Repository access blocked")})
+        argv = ("--no-color", "lastorgcommits", "myOrg", "since", "2015", "10", "11", "20", "00",
+                "00")
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(argv, mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastorgcommits myOrg since 2015-10-11 20:00:00\n" \
+                 + "myOrg/myRepo1 - Last commit pushed on 2015-10-11 22:00:00\n" \
+                 + "myOrg/myRepo2 - Last commit pushed on 2015-10-11 21:00:00\n" \
+                 + "myOrg/myRepo3 - Last commit pushed on 2015-10-11 20:00:00\n" \
+                 + "myOrg/myRepo3 - Committed on 2015-10-11 20:30:00 - myCommitter - myMessage\n" \
+                 + "Skipped unavailable repos:\n" \
+                 + "myOrg/myRepo2 - HTTP 403, 1 failure(s), next attempt on "
+        actual = mock_stdout.printed
+        self.assertTrue(actual.startswith(expected), actual)
+        self.assertEqual(cli._memory.repos.get("myOrg/myRepo1").failures, 0)
+
+        # Not attempted again on next run:
+        memory = cli._memory
+        requests = self.__mock_org()
+        cli = gcw.Cli(argv, mail.MailSender(), output.Output(MockPrint().do_print))
+        cli._memory = memory
+        cli.run()
+        self.assertNotIn("/repos/myOrg/myRepo2/commits", requests)
+        self.assertIn("/repos/myOrg/myRepo3/commits", requests)
+
+    @mock.patch("github.Github")
+    def test_lastorgcommits_quiet(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        requests = self.__mock_org()
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "lastorgcommits", "myOrg", "since", "2015", "10", "11", "23", "00",
+             "00"), mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli.run()
+        self.assertEqual(mock_stdout.printed, "lastorgcommits myOrg since 2015-10-11 23:00:00\n")
+        self.assertEqual(requests, ["/orgs/myOrg/repos"])
+
+    @mock.patch("github.Github")
+    def test_filters(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        for repo in self.__subscriptions:
+            repo.get_commits = mock.Mock(return_value=())
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "--include", "MYSUB*", "--exclude", "*2", "--author", "myAuthor",
+             "--path", "myDir/myFile", "--branch", "myBranch", "lastwatchedcommits", "myUsername",
+             "since", "2015", "10", "11", "20", "08", "00"), mail.MailSender(),
+            output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastwatchedcommits myUsername since 2015-10-11 20:08:00\n" \
+                 + "mySubscription1 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription3 - Last commit pushed on 2015-10-11 20:22:24\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+        self.__subscriptions[0].get_commits.assert_called_once_with(
+            since=datetime.datetime(2015, 10, 11, 20, 8), author="myAuthor", path="myDir/myFile",
+            sha="myBranch")
+        self.assertFalse(self.__subscriptions[1].get_commits.called)
+
     @mock.patch("gicowa.impl.mail.MailSender.send_email")
     @mock.patch("github.Github")
     def test_mailto(self, mock_github_constructor, mock_send_email):
@@ -166,7 +412,7 @@ Sent from %s.
     @mock.patch("github.Github")
     def test_no_email_sent(self, mock_github_constructor):
         mock_github_constructor.return_value = self.__mock_github
-        self.__mock_github_user.get_subscriptions.return_value = ()
+        self.__subscriptions = ()
         mock_stdout = MockPrint()
         cli = gcw.Cli(("--no-color", "--mailto", "myMail@myDomain.com", "watchlist",
                        "myUsername"), mail.MailSender(), output.Output(mock_stdout.do_print))
@@ -205,6 +451,21 @@ Sent from %s.
         with self.assertRaises(github.GithubException):
             cli.run()
 
+    @mock.patch("github.Github")
+    def test_watchlist_user_doesnt_exist(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        requester = self.__mock_github_user._requester
+        requester.requestJsonAndCheck = mock.Mock(
+            side_effect=github.GithubException(404, {"message": "Not Found"}))
+        cli = gcw.Cli(("watchlist", "myUsername"), mail.MailSender(),
+                      output.Output(MockPrint().do_print))
+        with self.assertRaises(github.GithubException) as context:
+            cli.run()
+        self.assertIn("myUsername user doesn't exist?", context.exception.args)
+        requester.requestJsonAndCheck.assert_called_once_with(
+            "GET", "/users/myUsername/subscriptions", {"per_page": 100, "page": 1}, {})
+        self.__mock_github.get_user.assert_called_once_with()
+
     @mock.patch("github.Github")
     def test_repo_doesnt_exist(self, mock_github_constructor):
         mock_github_constructor.return_value = self.__mock_github
@@ -215,6 +476,84 @@ Sent from %s.
         with self.assertRaises(github.GithubException):
             cli.run()
 
+    @mock.patch("github.Github")
+    def test_repo_unavailable(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        get_repo = self.__mock_github.get_repo
+
+        def get_repo_or_fail(full_name):
+            if full_name == "mySubscription2":
+                raise github.GithubException(404, {"message": "Not Found"})
+            return get_repo(full_name)
+
+        self.__mock_github.get_repo = mock.Mock(side_effect=get_repo_or_fail)
+        argv = ("--no-color", "lastwatchedcommits", "myUsername", "since", "2015", "10", "11",
+                "20", "08", "00")
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(argv, mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli.run()
+        expected = "lastwatchedcommits myUsername since 2015-10-11 20:08:00\n" \
+                 + "mySubscription1 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription1 - Committed on myDate - myCommitter - myMessage\n" \
+                 + "mySubscription3 - Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "mySubscription3 - Committed on myDate - myCommitter - myMessage\n" \
+                 + "Skipped unavailable repos:\n" \
+                 + "mySubscription2 - HTTP 404, 1 failure(s), next attempt on "
+        actual = mock_stdout.printed
+        self.assertTrue(actual.startswith(expected))
+
+        # Not attempted again on next run:
+        memory = cli._memory
+        self.__mock_github.get_repo.reset_mock()
+        cli = gcw.Cli(argv, mail.MailSender(), output.Output(MockPrint().do_print))
+        cli._memory = memory
+        cli.run()
+        self.assertNotIn(mock.call("mySubscription2"), self.__mock_github.get_repo.mock_calls)
+        self.assertEqual(memory.repos.get("mySubscription2").failures, 1)
+
+    @mock.patch("github.Github")
+    def test_repo_recovered(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        get_commits_calls = {}
+        for repo in self.__subscriptions:
+            repo.get_commits = mock.Mock(return_value=())
+            get_commits_calls[repo.full_name] = repo.get_commits.call_args_list
+        cli = gcw.Cli(("lastwatchedcommits", "myUsername", "since", "2015", "10", "11", "20",
+                       "08", "00"), mail.MailSender(), output.Output(MockPrint().do_print))
+        cli._memory.repos = repostate.RepoStates()
+        last_listed = datetime.datetime(2015, 10, 11, 19, 0, 0)
+        cli._memory.repos.update("mySubscription2", cursor=timestamp.to_epoch(last_listed))
+        cli._memory.repos.fail("mySubscription2", 404, 0) # backoff already over
+        cli.run()
+        self.assertEqual(get_commits_calls["mySubscription1"],
+                         [mock.call(since=datetime.datetime(2015, 10, 11, 20, 8, 0))])
+        self.assertEqual(get_commits_calls["mySubscription2"], [mock.call(since=last_listed)])
+        self.assertEqual(cli._memory.repos.get("mySubscription2").failures, 0)
+
+    @mock.patch("github.Github")
+    def test_repo_renamed(self, mock_github_constructor):
+        mock_github_constructor.return_value = self.__mock_github
+        get_repo = self.__mock_github.get_repo
+        moved_repo = mock.Mock()
+        moved_repo.full_name = None
+        moved_repo.url = "https://api.github.com/repositories/1"
+        self.__mock_github.get_repo = lambda full_name_or_id: {
+            "myOldName": moved_repo, 1: get_repo("mySubscription1")}[full_name_or_id]
+        mock_stdout = MockPrint()
+        cli = gcw.Cli(
+            ("--no-color", "lastrepocommits", "myOldName", "since", "2015", "10", "11", "20",
+             "08", "00"), mail.MailSender(), output.Output(mock_stdout.do_print))
+        cli._memory.repos = repostate.RepoStates()
+        cli._memory.repos.update("myOldName", id=1)
+        cli.run()
+        expected = "lastrepocommits myOldName since 2015-10-11 20:08:00\n" \
+                 + "myOldName - Renamed to mySubscription1\n" \
+                 + "Last commit pushed on 2015-10-11 20:22:24\n" \
+                 + "Committed on myDate - myCommitter - myMessage\n"
+        actual = mock_stdout.printed
+        self.assertEqual(actual, expected)
+        self.assertEqual(list(cli._memory.repos), ["mySubscription1"])
+
     @mock.patch("gicowa.impl.persistence.Memory.save")
     @mock.patch("github.Github")
     def test_persist(self, mock_github_constructor, mock_save):
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+
+import gicowa.gicowa as gcw
+import gicowa.impl.mail as mail
+import gicowa.impl.output as output
+import gicowa.impl.persistence as persistence
+import gicowa.impl.replay as replay
+
+class MockConnection:
+    """Answers like GitHub would do for 'myUsername' watching one repo.
+    """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def request(self, verb, url, input, headers):
+        pass
+
+    def getresponse(self):
+        response = mock.Mock()
+        response.status = 200
+        response.getheaders.return_value = [("ETag", '"myEtag"')]
+        response.read.return_value = json.dumps([{"full_name": "mySubscription1"}])
+        return response
+
+    def close(self):
+        pass
+
+class ReplayTests(unittest.TestCase):
+    def setUp(self):
+        self.__directory = tempfile.mkdtemp()
+        self.__home = tempfile.mkdtemp()
+        self.__memory_filename = os.path.join(self.__home, ".gicowa")
+        self.__write_memory({"myCommand": {"YYYY": 2015}})
+        patcher = mock.patch.object(persistence.Memory, "filename", self.__memory_filename)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.__directory)
+        shutil.rmtree(self.__home)
+
+    def __write_memory(self, timestamps):
+        with open(self.__memory_filename, "wb") as f:
+            f.write(json.dumps({"timestamps": timestamps}))
+
+    def __run(self, *argv):
+        printed = []
+        self.__cli = gcw.Cli(argv, mail.MailSender(), output.Output(printed.append))
+        self.__cli.run()
+        return printed
+
+    @mock.patch("httplib.HTTPSConnection", MockConnection)
+    def __record(self):
+        return self.__run("--no-color", "--credentials", "myUsername:myPassword",
+                          "--record", self.__directory, "watchlist", "myUsername")
+
+    def test_record(self):
+        self.assertEqual(self.__record(), ["watchlist myUsername", "mySubscription1"])
+        filenames = sorted(os.listdir(self.__directory))
+        self.assertEqual(filenames, [".gicowa", "000001.json"])
+        self.assertEqual(
+            persistence.Memory(replay.memory_filename(self.__directory)).timestamps,
+            {"myCommand": {"YYYY": 2015}})
+        filenames.remove(".gicowa")
+        for filename in filenames:
+            with open(os.path.join(self.__directory, filename), "rb") as f:
+                content = f.read()
+            self.assertNotIn("myPassword", content)
+            self.assertNotIn(base64.b64encode("myUsername:myPassword"), content)
+            exchange = json.loads(content)
+            self.assertEqual(exchange["request_headers"]["Authorization"], replay.redacted)
+            self.assertEqual(exchange["status"], 200)
+
+    def test_replay(self):
+        self.__record()
+        printed = self.__run("--no-color", "--replay", self.__directory,
+                             "--replay-latency", "zero", "watchlist", "myUsername")
+        self.assertEqual(printed, ["watchlist myUsername", "mySubscription1"])
+
+    def test_replay_memory(self):
+        self.__record()
+        self.__write_memory({"myCommand": {"YYYY": 2016}}) # e.g. on another machine
+        with open(self.__memory_filename, "rb") as f:
+            content = f.read()
+        self.__run("--persist", "--replay", self.__directory, "--replay-latency", "zero",
+                   "watchlist", "myUsername")
+        self.assertEqual(self.__cli._memory.timestamps, {"myCommand": {"YYYY": 2015}})
+        with open(self.__memory_filename, "rb") as f:
+            self.assertEqual(f.read(), content)
+        with open(replay.memory_filename(self.__directory), "rb") as f:
+            self.assertNotIn("2016", f.read())
+
+    def test_replay_not_recorded(self):
+        with self.assertRaises(KeyError):
+            self.__run("--replay", self.__directory, "watchlist", "myUsername")
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import gicowa.impl.repostate as repostate
+
+class RepoStatesTests(unittest.TestCase):
+    def test_update(self):
+        states = repostate.RepoStates()
+        states.update("myRepo", id=42, pushed_at=1444594944,
+                      head_sha="0123456789abcdef0123456789abcdef01234567")
+        states.update("myRepo", cursor=1444595000)
+        state = states.get("myRepo")
+        self.assertEqual(state.id, 42)
+        self.assertEqual(state.name, "myRepo")
+        self.assertEqual(state.pushed_at, 1444594944)
+        self.assertEqual(state.head_sha, "0123456789abcdef0123456789abcdef01234567")
+        self.assertEqual(state.cursor, 1444595000)
+        self.assertEqual(state.next_poll, 0)
+        self.assertEqual(len(states), 1)
+        with self.assertRaises(KeyError):
+            states.get("myOtherRepo")
+
+    def test_schedule(self):
+        states = repostate.RepoStates()
+        states.schedule("myRepo1", 300)
+        states.schedule("myRepo2", 100)
+        states.schedule("myRepo3", 200)
+        states.schedule("myRepo2", 400) # rescheduled
+        self.assertEqual(states.next_due(), (200, "myRepo3"))
+        self.assertEqual(list(states.pop_due(300)), ["myRepo3", "myRepo1"])
+        self.assertEqual(states.next_due(), (400, "myRepo2"))
+        self.assertEqual(states.get("myRepo1").next_poll, 0)
+
+    def test_json(self):
+        states = repostate.RepoStates()
+        states.update("myRepo1", id=1, head_sha="0123456789abcdef0123456789abcdef01234567")
+        states.update("myRepo2", id=2, pushed_at=1444594944)
+        states.schedule("myRepo2", 100)
+        data = states.to_json()
+        self.assertEqual(data, {
+            "myRepo1": [1, 0, "0123456789abcdef0123456789abcdef01234567", 0, 0, 0, 0],
+            "myRepo2": [2, 1444594944, "", 0, 100, 0, 0]})
+        self.assertEqual(repostate.RepoStates.from_json(data).to_json(), data)
+
+    def test_fail(self):
+        states = repostate.RepoStates()
+        self.assertEqual(states.fail("myRepo", 404, 1000), 1000 + 3600)
+        self.assertEqual(states.fail("myRepo", 404, 5000), 5000 + 2 * 3600)
+        state = states.get("myRepo")
+        self.assertEqual((state.failures, state.status), (2, 404))
+        self.assertTrue(states.is_failing("myRepo", 5000))
+        self.assertFalse(states.is_failing("myRepo", 5000 + 2 * 3600))
+        self.assertEqual(repostate.RepoStates.from_json(states.to_json()).get("myRepo").failures,
+                         2)
+        states.recover("myRepo")
+        self.assertFalse(states.is_failing("myRepo", 5000))
+
+    def test_rename(self):
+        states = repostate.RepoStates()
+        states.update("myOldName", id=42)
+        states.rename("myOldName", "myNewName")
+        self.assertNotIn("myOldName", states)
+        self.assertEqual(states.get("myNewName").id, 42)
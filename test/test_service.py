@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import unittest
+import urllib2
+
+import gicowa.impl.repostate as repostate
+import gicowa.impl.service as service
+
+class ServiceTests(unittest.TestCase):
+    def setUp(self):
+        self.__watchers = {}
+        self.__repos = repostate.RepoStates()
+        self.__polled = []
+        self.__notified = []
+        self.__log = []
+        self.__resolved = []
+        self.__service = service.Service(self.__watchers, self.__repos, self.__poll,
+                                         self.__resolve, self.__notify, self.__log.append, 3600)
+
+    def test_register(self):
+        id = self.__service.register({"username": "AurelienLourot", "mailto": "me@mydomain.com"})
+        self.assertEqual(self.__watchers, {id: {"username": "AurelienLourot",
+                                                "mailto": "me@mydomain.com"}})
+        for malformed in ({"username": "AurelienLourot"},
+                          {"mailto": "me@mydomain.com"},
+                          {"username": "AurelienLourot", "repos": ["myUser/myRepo"],
+                           "mailto": "me@mydomain.com"},
+                          {"username": "AurelienLourot", "repos": None,
+                           "mailto": "me@mydomain.com"},
+                          {"username": None, "repos": ["myUser/myRepo"],
+                           "mailto": "me@mydomain.com"},
+                          {"username": None, "mailto": "me@mydomain.com"},
+                          {"repos": "myUser/myRepo", "mailto": "me@mydomain.com"},
+                          {"repos": [], "mailto": "me@mydomain.com"},
+                          {"repos": [["myUser/myRepo"]], "mailto": "me@mydomain.com"},
+                          ["AurelienLourot"]):
+            with self.assertRaises(ValueError):
+                self.__service.register(malformed)
+        self.assertTrue(self.__service.unregister(id))
+        self.assertFalse(self.__service.unregister(id))
+
+    def test_tick(self):
+        alice = self.__service.register({"username": "AurelienLourot",
+                                         "mailto": "me@mydomain.com"})
+        bob = self.__service.register({"repos": ["brillout/FasterWeb"],
+                                       "mailto": "you@yourdomain.com"})
+
+        self.__service.tick(1000) # first poll, only sets the cursors
+        self.assertEqual(self.__polled, [])
+        self.assertEqual(self.__notified, [])
+        self.assertEqual(self.__repos.get("brillout/FasterWeb").cursor, 1000)
+        self.assertEqual(self.__service.timeout(1000), 3600)
+
+        self.__service.tick(2000) # nothing due
+        self.assertEqual(self.__polled, [])
+
+        self.__service.tick(1000 + 3600)
+        self.assertEqual(sorted(self.__polled), [("AurelienLourot/uncommitted", 1000),
+                                                 ("brillout/FasterWeb", 1000)])
+        self.assertEqual(sorted(self.__notified), [
+            (alice, ["AurelienLourot/uncommitted pushed", "brillout/FasterWeb pushed"]),
+            (bob, ["brillout/FasterWeb pushed"])])
+
+    def test_tick_changes(self):
+        self.__service.register({"username": "AurelienLourot", "mailto": "me@mydomain.com"})
+        self.assertTrue(self.__service.tick(1000))
+        self.assertEqual(self.__resolved, ["AurelienLourot"])
+        self.assertFalse(self.__service.tick(1001)) # e.g. after a GET request
+        self.assertEqual(self.__service.timeout(1001), 3600 - 1)
+
+        self.__service.register({"repos": ["myUser/myRepo"], "mailto": "me@mydomain.com"})
+        self.__service.register({"username": "brillout", "mailto": "me@mydomain.com"})
+        self.assertTrue(self.__service.tick(2000))
+        self.assertEqual(self.__resolved, ["AurelienLourot", "brillout"]) # only the new one
+
+        self.assertTrue(self.__service.tick(1000 + 3600)) # due repos and username
+        self.assertEqual(self.__resolved, ["AurelienLourot", "brillout", "AurelienLourot"])
+        self.assertFalse(self.__service.tick(1000 + 3601))
+
+    def test_tick_malformed(self):
+        self.__watchers["1"] = {"repos": [["myUser/myRepo"]], "mailto": "me@mydomain.com"}
+        self.__watchers["2"] = {"username": "AurelienLourot", "repos": None,
+                                "mailto": "me@mydomain.com"}
+        self.__service.register({"repos": ["myUser/myRepo"], "mailto": "me@mydomain.com"})
+        self.__service.tick(1000)
+        self.__service.tick(1000 + 3600)
+        self.assertEqual(self.__polled, [("myUser/myRepo", 1000)])
+        self.assertEqual(len(self.__log), 2)
+
+    def test_tick_failure(self):
+        self.__service.register({"repos": ["myUser/myRepo"], "mailto": "me@mydomain.com"})
+        self.__service.tick(1000)
+        self.__polled = None # makes __poll() raise
+        self.__service.tick(1000 + 3600)
+        self.assertEqual(self.__notified, [])
+        self.assertEqual(self.__repos.get("myUser/myRepo").failures, 1)
+        self.assertEqual(self.__repos.next_due(), (1000 + 2 * 3600, "myUser/myRepo"))
+        self.assertEqual(len(self.__log), 1)
+
+    def test_http(self):
+        server = self.__service.make_server("localhost", 0)
+        url = "http://localhost:%s/watchers" % (server.server_port)
+
+        def request(method, url, data=None):
+            thread = threading.Thread(target=server.handle_request)
+            thread.start()
+            try:
+                request = urllib2.Request(url, data)
+                request.get_method = lambda: method
+                try:
+                    response = urllib2.urlopen(request)
+                except urllib2.HTTPError as e:
+                    response = e
+                return response.getcode(), json.loads(response.read())
+            finally:
+                thread.join()
+
+        status, data = request("POST", url, json.dumps({"repos": ["myUser/myRepo"],
+                                                        "mailto": "me@mydomain.com"}))
+        self.assertEqual(status, 201)
+        self.assertEqual(request("GET", url), (200, {data["id"]: {"repos": ["myUser/myRepo"],
+                                                                   "mailto": "me@mydomain.com"}}))
+        self.assertEqual(request("POST", url, "{}")[0], 400)
+        self.assertEqual(request("POST", url, json.dumps({"repos": [["myUser/myRepo"]],
+                                                          "mailto": "me@mydomain.com"}))[0], 400)
+        self.assertEqual(request("DELETE", url + "/" + data["id"]), (200, {}))
+        self.assertEqual(request("DELETE", url + "/" + data["id"])[0], 404)
+        server.server_close()
+
+    def __poll(self, repo_full_name, since):
+        self.__polled.append((repo_full_name, since))
+        return ["%s pushed" % (repo_full_name)]
+
+    def __resolve(self, username):
+        self.__resolved.append(username)
+        return ["AurelienLourot/uncommitted", "brillout/FasterWeb"]
+
+    def __notify(self, watcher, lines):
+        id = [id for id, value in self.__watchers.iteritems() if value is watcher][0]
+        self.__notified.append((id, sorted(lines)))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import mock
+import unittest
+
+import gicowa.impl.watchlist as watchlist
+
+class WatchlistTests(unittest.TestCase):
+    def setUp(self):
+        self.__requester = mock.Mock()
+        self.__full_page = [{"full_name": "myRepo%s" % i} for i in xrange(watchlist.per_page)]
+
+    def test_refresh(self):
+        self.__requester.requestJsonAndCheck.side_effect = [
+            ({"etag": '"myEtag1"'}, self.__full_page),
+            ({"etag": '"myEtag2"'}, [{"full_name": "myLastRepo"}])]
+        my_watchlist = watchlist.Watchlist()
+        added = my_watchlist.refresh(self.__requester, "/users/myUsername/subscriptions")
+        self.assertEqual(len(my_watchlist.repos), watchlist.per_page + 1)
+        self.assertEqual(added, set(my_watchlist.repos))
+        self.__requester.requestJsonAndCheck.assert_called_with(
+            "GET", "/users/myUsername/subscriptions", {"per_page": watchlist.per_page, "page": 2},
+            {})
+
+    def test_refresh_not_modified(self):
+        my_watchlist = watchlist.Watchlist({"fetched": 0, "pages": [
+            ['"myEtag1"', [repo["full_name"] for repo in self.__full_page]],
+            ['"myEtag2"', ["myLastRepo"]]]})
+        self.__requester.requestJsonAndCheck.side_effect = [
+            ({}, None),
+            ({"etag": '"myEtag3"'}, [{"full_name": "myLastRepo"}, {"full_name": "myNewRepo"}])]
+        added = my_watchlist.refresh(self.__requester, "/users/myUsername/subscriptions")
+        self.assertEqual(added, set(("myNewRepo",)))
+        self.assertEqual(my_watchlist.repos[-2:], ["myLastRepo", "myNewRepo"])
+        self.__requester.requestJsonAndCheck.assert_any_call(
+            "GET", "/users/myUsername/subscriptions", {"per_page": watchlist.per_page, "page": 1},
+            {"If-None-Match": '"myEtag1"'})
+
+    def test_is_outdated(self):
+        my_watchlist = watchlist.Watchlist()
+        self.assertTrue(my_watchlist.is_outdated(3600))
+        with mock.patch("time.time") as mock_time:
+            mock_time.return_value = 1444594944
+            my_watchlist.refresh(mock.Mock(**{"requestJsonAndCheck.return_value": ({}, [])}),
+                                 "/users/myUsername/subscriptions")
+            mock_time.return_value += 60
+            self.assertFalse(my_watchlist.is_outdated(3600))
+            self.assertTrue(my_watchlist.is_outdated(0))